@@ -31,6 +31,7 @@ from liblet.llvm import LLVM
 from liblet.utils import (
   AttrDict,
   CYKTable,
+  PStack,
   Queue,
   Stack,
   Table,
@@ -75,6 +76,7 @@ __all__ = [
   'Production',
   'ProductionGraph',
   'Productions',
+  'PStack',
   'pyast2tree',
   'Queue',
   'resized_svg_repr',
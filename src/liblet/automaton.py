@@ -1,15 +1,14 @@
+from array import array
 from collections.abc import Set  # noqa: PYI025
 from copy import copy
-from functools import total_ordering
-from operator import attrgetter
+from functools import lru_cache
 
 from liblet.const import DIAMOND, HASH, ε
 from liblet.display import Tree
-from liblet.grammar import Item
-from liblet.utils import Stack, letstr
+from liblet.grammar import Item, _intern
+from liblet.utils import PStack, letstr
 
 
-@total_ordering
 class Transition:
   """An automaton transition.
 
@@ -31,8 +30,8 @@ class Transition:
     ['A', 'B']
     >>> label
     'c'
-    >>> to
-    {'D'}
+    >>> sorted(to)
+    ['D']
 
   Args:
     frm (:obj:`str` or :obj:`set` of :obj:`str`): The starting state(s) of the transition.
@@ -44,44 +43,73 @@ class Transition:
           of nonempty strings, or the label is not a nonempty string.
   """
 
-  __slots__ = ('frm', 'label', 'to')
+  __slots__ = ('_hash', 'frm', 'label', 'to')
 
   def __init__(self, frm, label, to):
+    # returns the canonical (hashable) form of a valid state, None otherwise
     def _cssos(s):
       if isinstance(s, str) and s:
-        return True
+        return s
       if isinstance(s, Set) and s and all(isinstance(_, str) and _ for _ in s):
-        return True
+        return frozenset(s)
       if isinstance(s, Set) and s and all(isinstance(_, Item) for _ in s):
-        return True
-      return False
+        return frozenset(s)
+      return None
 
-    if _cssos(frm):
-      self.frm = frm
-    else:
+    self.frm = _cssos(frm)
+    if self.frm is None:
       raise ValueError('The frm state is not a nonempty string, or a nonempty set of nonempty strings/items')
     if isinstance(label, str) and label:
-      self.label = label
+      self.label = _intern(label)
     else:
       raise ValueError('The label is not a nonempty string')
-    if _cssos(to):
-      self.to = to
-    else:
+    self.to = _cssos(to)
+    if self.to is None:
       raise ValueError('The to state is not a nonempty string, or a nonempty set of nonempty strings/items')
-    self.to = to
+    self._hash = None
+
+  def _lt(self, other):
+    if self.frm != other.frm:
+      return self.frm < other.frm
+    if self.label != other.label:
+      return self.label < other.label
+    return self.to < other.to
+
+  # the comparisons are spelled out as functools.total_ordering would derive them from __lt__ and __eq__
 
   def __lt__(self, other):
     if not isinstance(other, Transition):
       return NotImplemented
-    return (self.frm, self.label, self.to) < (other.frm, other.label, other.to)
+    return self._lt(other)
+
+  def __le__(self, other):
+    if not isinstance(other, Transition):
+      return NotImplemented
+    return self._lt(other) or self == other
+
+  def __gt__(self, other):
+    if not isinstance(other, Transition):
+      return NotImplemented
+    return not self._lt(other) and self != other
+
+  def __ge__(self, other):
+    if not isinstance(other, Transition):
+      return NotImplemented
+    return not self._lt(other)
 
   def __eq__(self, other):
     if not isinstance(other, Transition):
       return False
-    return (self.frm, self.label, self.to) == (other.frm, other.label, other.to)
+    return self.frm == other.frm and self.label == other.label and self.to == other.to
 
   def __hash__(self):
-    return hash((self.frm, self.label, self.to))
+    if self._hash is None:
+      self._hash = hash((self.frm, self.label, self.to))
+    return self._hash
+
+  # the cached hash depends on the hash seed of the process, so it is not pickled (nor copied)
+  def __reduce__(self):
+    return (type(self), (self.frm, self.label, self.to))
 
   def __iter__(self):
     return iter((self.frm, self.label, self.to))
@@ -102,13 +130,27 @@ class Transition:
 
     where the parts are strings not containing spaces.
     """
-    res = []
-    for t in transitions.splitlines():
-      if not t.strip():
-        continue
-      frm, label, to = t.split(',')
-      res.append(Transition(frm.strip(), label.strip(), to.strip()))
-    return tuple(res)
+    return tuple(cls(frm, label, to) for frm, label, to in _parse_transitions(transitions))
+
+
+def _bits(b):
+  # yields the positions of the bits set in b, from the lowest
+  while b:
+    low = b & -b
+    yield low.bit_length() - 1
+    b ^= low
+
+
+# only the (frm, label, to) triples are cached, since transitions are mutable (and cache their hash)
+@lru_cache(maxsize=256)
+def _parse_transitions(transitions):
+  res = []
+  for t in transitions.splitlines():
+    if not t.strip():
+      continue
+    frm, label, to = t.split(',')
+    res.append((frm.strip(), label.strip(), to.strip()))
+  return tuple(res)
 
 
 class Automaton:
@@ -124,9 +166,25 @@ class Automaton:
     F (set): The set of *final* states.
   """
 
-  __slots__ = ('N', 'T', 'transitions', 'q0', 'F')
-
-  def __init__(self, N, T, transitions, q0, F):
+  __slots__ = (
+    'N',
+    'T',
+    'transitions',
+    'q0',
+    'F',
+    '_state_of_id',
+    '_id_of_state',
+    '_label_of_id',
+    '_id_of_label',
+    '_frm_ids',
+    '_label_ids',
+    '_to_ids',
+    '_delta',
+    '_eps_bits',
+    '_eps_closure',
+  )
+
+  def __init__(self, N, T, transitions, q0, F, _trusted=False):
     self.N = set(N)
     self.T = set(T)
     self.transitions = tuple(transitions)
@@ -140,13 +198,59 @@ class Automaton:
       raise ValueError(f'The specified q0 ({letstr(q0)}) is not a state.')
     if not self.F <= self.N:
       raise ValueError(f'The accepting states {letstr(self.F - self.N)} in F are not states.')
-    bad_trans = tuple(
-      t for t in transitions if t.frm not in self.N or t.to not in self.N or t.label not in (self.T | {ε})
-    )
-    if bad_trans:
-      raise ValueError(
-        f'The following transitions contain states or symbols that are neither states nor input symbols: {bad_trans}.'
-      )
+    # states and labels are given contiguous integer ids (ε is always 0) and the transitions are
+    # flattened in three parallel arrays of such ids, on which the δ index and ε-closures are built;
+    # the transitions are validated in the same pass (a transition is bad if some of its ids is missing),
+    # unless they are _trusted, that is they come from a factory method that built N and T accordingly
+    self._state_of_id = tuple(sorted(self.N, key=str))
+    self._id_of_state = id_of_state = {X: i for i, X in enumerate(self._state_of_id)}
+    self._label_of_id = (ε, *sorted(self.T - {ε}, key=str))
+    self._id_of_label = id_of_label = {x: i for i, x in enumerate(self._label_of_id)}
+    if _trusted:
+      self._frm_ids = array('i', [id_of_state[t.frm] for t in self.transitions])
+      self._label_ids = array('i', [id_of_label[t.label] for t in self.transitions])
+      self._to_ids = array('i', [id_of_state[t.to] for t in self.transitions])
+    else:
+      self._frm_ids, self._label_ids, self._to_ids = array('i'), array('i'), array('i')
+      bad_trans = []
+      for t in self.transitions:
+        f, x, d = id_of_state.get(t.frm), id_of_label.get(t.label), id_of_state.get(t.to)
+        if f is None or x is None or d is None:
+          bad_trans.append(t)
+          continue
+        self._frm_ids.append(f)
+        self._label_ids.append(x)
+        self._to_ids.append(d)
+      if bad_trans:
+        raise ValueError(
+          f'The following transitions contain states or symbols that are neither states nor input symbols: {tuple(bad_trans)}.'
+        )
+    delta = {}
+    for f, x, t in zip(self._frm_ids, self._label_ids, self._to_ids):
+      delta.setdefault((f, x), set()).add(t)
+    # the ε-closures are bitsets (Python ints) where bit i is set iff the state of id i belongs to the
+    # closure; they are seeded with the ε-successors and then or-ed together until a fixed point is reached
+    eps_bits = [1 << q for q in range(len(self._state_of_id))]
+    for (f, x), ts in delta.items():
+      if x == 0:
+        for t in ts:
+          eps_bits[f] |= 1 << t
+    changed = True
+    while changed:
+      changed = False
+      for q, b in enumerate(eps_bits):
+        nb = b
+        for r in _bits(b):
+          nb |= eps_bits[r]
+        if nb != b:
+          eps_bits[q] = nb
+          changed = True
+    self._eps_bits = eps_bits
+    state_of_id, label_of_id = self._state_of_id, self._label_of_id
+    self._delta = {
+      (state_of_id[f], label_of_id[x]): frozenset(state_of_id[t] for t in ts) for (f, x), ts in delta.items()
+    }
+    self._eps_closure = {state_of_id[q]: frozenset(state_of_id[r] for r in _bits(b)) for q, b in enumerate(eps_bits)}
 
   def δ(self, X, x):
     """The transition function.
@@ -157,9 +261,40 @@ class Automaton:
       X: the state.
       x: the input symbol.
     Returns:
-      The set of next states of the automaton.
+      The (frozen) set of next states of the automaton.
     """
-    return {Z for Y, y, Z in self.transitions if Y == X and y == x}
+    if isinstance(X, Set):  # set states are stored as frozensets, as in Transition
+      X = frozenset(X)
+    return self._delta.get((X, x), frozenset())
+
+  def epsilon_closure(self, X):
+    """The ε-closure of a state.
+
+    Args:
+      X: the state.
+    Returns:
+      The (frozen) set of states reachable from the given one (including itself) following only ε-transitions.
+    """
+    return self._eps_closure[X]
+
+  def epsilon_closure_bits(self, X):
+    """The ε-closure of a state, as a bitset.
+
+    Args:
+      X: the state.
+    Returns:
+      An :obj:`int` whose bits set correspond to the states in the ε-closure of the given one,
+      that can be decoded with :meth:`bits_to_states`.
+    """
+    return self._eps_bits[self._id_of_state[X]]
+
+  def bits_to_states(self, bits):
+    """Yields the states corresponding to the bits set in the given bitset.
+
+    Args:
+      bits (int): a bitset, as returned by :meth:`epsilon_closure_bits`.
+    """
+    return (self._state_of_id[i] for i in _bits(bits))
 
   def __repr__(self):
     return f'Automaton(N={letstr(self.N)}, T={letstr(self.T)}, transitions={self.transitions}, F={letstr(self.F)}, q0={letstr(self.q0)})'
@@ -181,9 +316,13 @@ class Automaton:
       F = set()
     if q0 is None:
       q0 = transitions[0].frm
-    N = set(map(attrgetter('frm'), transitions)) | set(map(attrgetter('to'), transitions))
-    T = set(map(attrgetter('label'), transitions)) - {ε}
-    return cls(N, T, transitions, q0, F)
+    N, T = set(), set()
+    for t in transitions:
+      N.add(t.frm)
+      N.add(t.to)
+      if t.label != ε:
+        T.add(t.label)
+    return cls(N, T, transitions, q0, F, _trusted=True)
 
   @classmethod
   def from_grammar(cls, G):
@@ -196,22 +335,25 @@ class Automaton:
     grammar are of the form :math:`A\to aB`, :math:`A\to B`, :math:`A\to a`,
     and :math:`A\to ε`.
     """
-    res = []
     if not G.is_context_free:
       raise ValueError('The grammar is not context-free, thus cannot be regular')
-    for P in G.P:
-      if len(P.rhs) > 2:  #  noqa: PLR2004
-        raise ValueError(f'Production {P} has more than two symbols on the left-hand side')
-      if len(P.rhs) == 2:  #  noqa: PLR2004
-        A, (a, B) = P
-        if not (a in G.T and B in G.N):
-          raise ValueError(f'Production {P} right-hand side is not of the aB form')
-        res.append(Transition(A, a, B))
-      elif P.rhs[0] in G.N:
-        res.append(Transition(P.lhs, ε, P.rhs[0]))
-      else:
-        res.append(Transition(P.lhs, P.rhs[0], DIAMOND))
-    return cls(G.N | {DIAMOND}, G.T, tuple(res), G.S, {DIAMOND})
+    N, T = G.N, G.T
+    return cls(
+      N | {DIAMOND}, T, tuple([_regular_production_to_transition(P, N, T) for P in G.P]), G.S, {DIAMOND}, _trusted=True
+    )
+
+
+def _regular_production_to_transition(P, N, T):
+  if len(P.rhs) > 2:  #  noqa: PLR2004
+    raise ValueError(f'Production {P} has more than two symbols on the left-hand side')
+  if len(P.rhs) == 2:  #  noqa: PLR2004
+    A, (a, B) = P
+    if not (a in T and B in N):
+      raise ValueError(f'Production {P} right-hand side is not of the aB form')
+    return Transition(A, a, B)
+  if P.rhs[0] in N:
+    return Transition(P.lhs, ε, P.rhs[0])
+  return Transition(P.lhs, P.rhs[0], DIAMOND)
 
 
 class InstantaneousDescription:
@@ -223,26 +365,45 @@ class InstantaneousDescription:
     G (:class:`~liblet.grammar.Grammar`): The :class:`~liblet.grammar.Grammar` related to the automaton.
   """
 
+  __slots__ = ('G', '_stack_str', '_tape_str', 'head_pos', 'stack', 'steps', 'tape')
+
   def __init__(self, G):
     self.G = G
     self.tape = ()
-    self.stack = Stack()
+    self.stack = PStack()
     self.steps = ()
     self.head_pos = 0
+    # the string representations are cached along with the (tape, head_pos) and stack they refer to
+    self._tape_str = None
+    self._stack_str = None
 
   def __copy__(self):
     c = type(self)(self.G)
     c.tape = self.tape
-    c.stack = copy(self.stack)
+    c.stack = self.stack
     c.steps = self.steps
     c.head_pos = self.head_pos
+    c._tape_str = self._tape_str
+    c._stack_str = self._stack_str
     return c
 
   def _stack_str_(self):
-    return ''.join(reversed(list(map(str, self.stack))))
+    if self._stack_str is None or self._stack_str[0] is not self.stack:
+      self._stack_str = (self.stack, ''.join(map(str, self._stack_items_())))
+    return self._stack_str[1]
+
+  def _stack_items_(self):
+    # the stack items, in the order they are shown (from the top)
+    return reversed(self.stack)
 
   def _tape_str_(self):
-    return ''.join(self.tape[: self.head_pos :] + ('｜',) + self.tape[self.head_pos :])  # noqa: RUF001
+    if self._tape_str is None or self._tape_str[0] is not self.tape or self._tape_str[1] != self.head_pos:
+      self._tape_str = (
+        self.tape,
+        self.head_pos,
+        ''.join(self.tape[: self.head_pos]) + '｜' + ''.join(self.tape[self.head_pos :]),  # noqa: RUF001
+      )
+    return self._tape_str[2]
 
   def __repr__(self):
     return f'{self.steps}, {self._stack_str_()}, {self._tape_str_()}'
@@ -271,13 +432,15 @@ class TopDownInstantaneousDescription(InstantaneousDescription):
     word (tuple): The word initially on the tape.
   """
 
+  __slots__ = ()
+
   def __init__(self, G, word=None):
     super().__init__(G)
     if HASH in (G.N | G.T):
       raise ValueError('The ' + HASH + ' sign must not belong to terminal, or nonterminals.')
     if word is not None:
       self.tape = (*tuple(word), HASH)
-      self.stack = Stack([HASH, G.S])
+      self.stack = PStack([HASH, G.S])
 
   def is_done(self):
     """Returns `True` if the computation is done, that is if the top of the stack and the symbol under the tape head are both equal to `♯`."""
@@ -285,11 +448,11 @@ class TopDownInstantaneousDescription(InstantaneousDescription):
 
   def match(self):
     """Attempts a match move and returns the corresponding new instantaneous description."""
-    if (self.top() == ε) or (self.top() in self.G.T and self.top() == self.head()):
+    top = self.top()
+    if (top == ε) or (top in self.G.T and top == self.head()):
       c = copy(self)
-      c.stack = copy(c.stack)
-      c.stack.pop()
-      if self.top() != ε:
+      _, c.stack = c.stack.pop()
+      if top != ε:
         c.head_pos += 1
       return c
     raise ValueError('The top of the stack and tape head symbol are not equal.')
@@ -298,11 +461,11 @@ class TopDownInstantaneousDescription(InstantaneousDescription):
     """Attempts a prediction move, given the specified production, and returns the corresponding new instantaneous description."""
     if P in self.G.P and self.top() == P.lhs:
       c = copy(self)
-      c.stack = copy(c.stack)
-      c.stack.pop()
+      _, c.stack = c.stack.pop()
       c.steps += (P,)
       for X in reversed(P.rhs):
-        if X !=  ε :c.stack.push(X)
+        if X != ε:
+          c.stack = c.stack.push(X)
       return c
     raise ValueError('The top of the stack does not correspond to the production lhs.')
 
@@ -317,6 +480,8 @@ class BottomUpInstantaneousDescription(InstantaneousDescription):
     word (tuple): The word initially on the tape.
   """
 
+  __slots__ = ()
+
   def __init__(self, G, word=None):
     super().__init__(G)
     if word is not None:
@@ -329,7 +494,7 @@ class BottomUpInstantaneousDescription(InstantaneousDescription):
   def shift(self):
     """Performs a shift move and returns the corresponding new instantaneous description."""
     c = copy(self)
-    c.stack.push(Tree(c.head()))
+    c.stack = c.stack.push(Tree(c.head()))
     c.head_pos += 1
     return c
 
@@ -337,13 +502,18 @@ class BottomUpInstantaneousDescription(InstantaneousDescription):
     """Attempts a reduce move, given the specified production, and returns the corresponding new instantaneous description."""
     if P not in self.G.P:
       raise ValueError('The production does not belong to the grammar.')
+    rhs = P.rhs
+    children = [None] * len(rhs)
+    stack = self.stack
+    for i in range(len(rhs) - 1, -1, -1):
+      t, stack = stack.pop()
+      if t.root != rhs[i]:
+        raise ValueError('The rhs does not correspond to the symbols on the stack.')
+      children[i] = t
     c = copy(self)
-    children = [c.stack.pop() for _ in P.rhs][::-1]
-    if tuple(t.root for t in children) != P.rhs:
-      raise ValueError('The rhs does not correspond to the symbols on the stack.')
-    c.stack.push(Tree(P.lhs, children))
+    c.stack = stack.push(Tree(P.lhs, children))
     c.steps = (P, *c.steps)
     return c
 
-  def _stack_str_(self):
-    return ''.join(map(str, self.stack))
+  def _stack_items_(self):
+    return iter(self.stack)
@@ -1,6 +1,14 @@
-ε = 'ε'
-DIAMOND = '◇'
-HASH = '♯'
+from sys import intern
+
+# the special symbols are interned, as the symbols of productions, so that comparing them for
+# equality mostly ends at the identity check (but grammars that are unpickled, or deep copied,
+# hold symbols that are not interned, so they must always be compared by equality)
+ε = intern('ε')
+DIAMOND = intern('◇')
+HASH = intern('♯')
 GV_FONT_NAME = 'Fira Code'
 GV_FONT_SIZE = '12' # must be a string
 HTML_FONT_NAME = GV_FONT_NAME
+# the styles of the HTML tables, evaluated once at import (instead of at every rendering)
+HTML_TABLE_STYLE = f'<style>td, th {{border: 1pt solid lightgray !important;}} table * {{font-family: "{HTML_FONT_NAME}";}}</style>'
+HTML_LEFT_TABLE_STYLE = f'<style>td, th {{border: 1pt solid lightgray !important; text-align: left !important;}} table * {{font-family: "{HTML_FONT_NAME}";}}</style>'
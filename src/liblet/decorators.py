@@ -1,8 +1,12 @@
 from copy import deepcopy
-from functools import wraps
+from functools import partial, wraps
 
+# how to cheaply copy the closure argument, by type; other types (as dicts, or lists, whose
+# values can be updated in place by the wrapped function) must be copied with deepcopy
+_CHEAP_COPY = {set: set.copy, frozenset: lambda s: s}
 
-def closure(f):
+
+def closure(f=None, *, incremental=False):
   """Wraps a function in a closure computation.
 
   This decorator takes a function ``f(S, O)`` and returns a function ``F(S, O)`` that repeatedly calls
@@ -10,6 +14,9 @@ def closure(f):
 
   Args:
     f: the function to wrap in the closure computation.
+    incremental (bool): if ``True`` (in which case the decorator must be used as ``@closure(incremental=True)``),
+      ``S`` must be a set and ``f`` is expected to return just the (possibly overlapping) set of elements to add to it;
+      the closure is then computed updating a single set until ``f`` returns no new elements.
 
   Example:
 
@@ -27,6 +34,16 @@ def closure(f):
 
     It is evident that its closure will return the set of values from ``m`` to the largest element in ``S``.
 
+    The same closure can be computed incrementally, if the function returns just the elements to be added
+
+    .. doctest::
+
+      >>> @closure(incremental=True)
+      ... def reduce_up_to(S, m):
+      ...   return {s - 1 for s in S if s > m}
+      >>> reduce_up_to({7, 5}, 3)
+      {3, 4, 5, 6, 7}
+
   Notes:
 
     More formally, consider a function :math:`f : \\mathfrak{D}\\times \\mathfrak{X} \\to \\mathfrak{D}`
@@ -41,11 +58,21 @@ def closure(f):
 
   """
 
+  if f is None:
+    return partial(closure, incremental=incremental)
+
   @wraps(f)
   def _closure(*args):
     s, *other = args
+    if incremental:
+      s = set(s)
+      while True:
+        size = len(s)
+        s |= f(s, *other)
+        if len(s) == size:
+          return s
     while True:
-      n = f(deepcopy(s), *other)
+      n = f(_CHEAP_COPY.get(type(s), deepcopy)(s), *other)
       if n == s:
         return n
       s = n
@@ -1,31 +1,60 @@
 import ast
+import re
 from abc import ABC, abstractmethod
-from collections import OrderedDict
+from collections import defaultdict
 from collections.abc import Mapping, Set  # noqa: PYI025
-from functools import partial
-from html import escape
-from itertools import chain, pairwise
-from operator import itemgetter
-from re import sub
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import pairwise
 from textwrap import indent
 from warnings import warn as wwarn
 
 import svgutils.transform as svg_ttransform
-from graphviz import Digraph
+from graphviz import Digraph, Source
 from IPython.display import HTML, SVG, display
 from ipywidgets import IntSlider, interactive
 
-from liblet.const import GV_FONT_NAME, GV_FONT_SIZE, HTML_FONT_NAME, ε
+from liblet.const import GV_FONT_NAME, GV_FONT_SIZE, HTML_TABLE_STYLE, ε
 from liblet.grammar import HAIR_SPACE, Derivation, Productions
-from liblet.utils import AttrDict, CYKTable, compose, letstr
+from liblet.utils import AttrDict, CYKTable, Table, letstr
+
+# the replacements of html.escape (with quote=True), plus the square brackets
+_ESCAPE_TABLE = str.maketrans(
+  {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;', '[': '&#91;', ']': '&#93;'}
+)
+
+
+# keyed on the string form of the label, so that 1 and True do not collide
+@lru_cache(maxsize=4096)
+def _escape_str(label):
+  return label.translate(_ESCAPE_TABLE)
 
 
 def _escape(label):
-  return sub(r'\]', '&#93;', sub(r'\[', '&#91;', escape(str(label))))
+  return _escape_str(label if type(label) is str else str(label))
+
+
+# caps the network simplex iterations of dot, used by the classes whose fast_layout is True
+_FAST_LAYOUT = {'nslimit': '5', 'nslimit1': '5'}
+
+# the default attributes of nodes and edges
+_GV_FONT_ATTRS = {'fontname': GV_FONT_NAME, 'fontsize': GV_FONT_SIZE}
+
+
+# strings are cached, other objects are not (equal objects, as 1 and True, can print differently)
+def _letstr(obj, sep=None):
+  if type(obj) is str:
+    return obj
+  return letstr(obj, sep)
+
+
+# the head and tail of the HTML-like labels of mappings
+_LABEL_TABLE_HEAD = '<<FONT POINT-SIZE="12"><TABLE BORDER="0" CELLBORDER="1" CELLSPACING="0">'
+_LABEL_TABLE_TAIL = '</TABLE></FONT>>'
 
 
 def make_mapping_aware_label(
-  other_str=letstr,  # in mapping_aware_label, how to represent non-mapping objects
+  other_str=_letstr,  # in mapping_aware_label, how to represent non-mapping objects
   key_str=str,  # in mapping_aware_label, how to represent keys
   value_str=_escape,  # in mapping_aware_label, how to represent values
   key_filter=lambda k: not k.startswith('_thread_'),  # in mapping_aware_label, which keys to show
@@ -33,11 +62,11 @@ def make_mapping_aware_label(
   def mapping_aware_label(obj):
     if obj is None:
       return None
-    if isinstance(obj, Mapping):
-      return ''.join(
-        ['<<FONT POINT-SIZE="12"><TABLE BORDER="0" CELLBORDER="1" CELLSPACING="0">']
-        + [f'<TR><TD>{key_str(k)}</TD><TD>{value_str(obj[k])}</TD></TR>' for k in filter(key_filter, obj)]
-        + ['</TABLE></FONT>>']
+    if type(obj) is dict or isinstance(obj, Mapping):
+      return (
+        _LABEL_TABLE_HEAD
+        + ''.join([f'<TR><TD>{key_str(k)}</TD><TD>{value_str(v)}</TD></TR>' for k, v in obj.items() if key_filter(k)])
+        + _LABEL_TABLE_TAIL
       )
     return other_str(obj)
 
@@ -46,10 +75,31 @@ def make_mapping_aware_label(
 
 def mapping_aware_gv_args(obj):
   return (
-    {'shape': 'none', 'margin': '0', 'height': '0', 'width': '0'} if isinstance(obj, Mapping) else {'margin': '.05'}
+    {'shape': 'none', 'margin': '0', 'height': '0', 'width': '0'}
+    if type(obj) is dict or isinstance(obj, Mapping)
+    else {'margin': '.05'}
   )
 
 
+# the label and gv args of the nodes of Tree and ProductionGraph
+
+_mapping_aware_label = make_mapping_aware_label()
+
+
+def _first_mapping_aware_label(node):
+  obj = node[0]
+  if type(obj) is str:
+    return obj
+  return _mapping_aware_label(obj)
+
+
+def _first_mapping_aware_gv_args(node):
+  obj = node[0]
+  if type(obj) is str:
+    return {'margin': '.05'}
+  return mapping_aware_gv_args(obj)
+
+
 def make_node_wrapper(
   node_label=None,  # how to produce the node label from the node object
   node_eq='obj',  # how to decide equality between nodes
@@ -60,11 +110,10 @@ def make_node_wrapper(
   elif not callable(node_label):
     raise ValueError('node_label must be either None or a callable')
 
+  eq_label = node_eq == 'label'
   if node_eq == 'obj':
-    node_eq = lambda x, y: x == y
-  elif node_eq == 'label':
-    node_eq = lambda x, y: node_label(x) == node_label(y)
-  elif not callable(node_eq):
+    node_eq = None  # the objects are compared inline by EHW.__eq__
+  elif not (eq_label or callable(node_eq)):
     raise ValueError('node_eq must be either "obj", "label" or a callable')
 
   if node_gv_args is None:
@@ -72,36 +121,62 @@ def make_node_wrapper(
   elif not callable(node_gv_args):
     raise ValueError('node_gv_args must be either None or a callable')
 
+  # the label is computed once, when the object is wrapped
   class EHW:
-    def __init__(self, obj):
+    __slots__ = ('_hash', '_label', 'obj')
+
+    def __init__(self, obj, label):
       self.obj = obj
+      self._label = label
+      self._hash = hash(label)
 
     def __eq__(self, other):
+      if self is other:
+        return True
       if not isinstance(other, EHW):
         return False
+      if eq_label:
+        return self._label == other._label
+      if node_eq is None:
+        return self.obj is other.obj or self.obj == other.obj
       return node_eq(self.obj, other.obj)
 
     def __hash__(self):
-      return hash(node_label(self.obj))
+      return self._hash
 
+  # the wrappers are registered per graph, so that the same object always has the same gid
   class NodeWrapper(EHW):
+    __slots__ = ('_gid', '_gv_args')
+
     _wn2gid = {}  # noqa: RUF012
 
-    def __new__(cls, obj):
-      ehw = EHW(obj)
-      if ehw not in cls._wn2gid:
-        intsance = cls._wn2gid[ehw] = super().__new__(cls)
-        intsance._gid = f'N{len(cls._wn2gid)}'
-      return cls._wn2gid[ehw]
+    def __new__(cls, obj, registry=None):
+      if registry is None:
+        registry = cls._wn2gid
+      label = node_label(obj)
+      key = label if eq_label else EHW(obj, label)
+      instance = registry.get(key)
+      if instance is None:
+        instance = registry[key] = super().__new__(cls)
+        instance.obj, instance._label, instance._hash = obj, label, hash(label)
+        instance._gid = f'N{len(registry)}'
+        instance._gv_args = None
+      return instance
+
+    def __init__(self, obj, registry=None):
+      pass  # the instance has been initialized by __new__, when first created
 
     def gid(self):
       return self._gid
 
     def label(self):
-      return node_label(self.obj)
+      return self._label
 
+    # the default gv args are computed once per wrapper
     def gv_args(self):
-      return node_gv_args(self.obj)
+      if self._gv_args is None:
+        self._gv_args = node_gv_args(self.obj)
+      return self._gv_args
 
     def __repr__(self):
       return f'NodeWrapper[obj = {self.obj}, label = {self.label()}, hash = {hash(self)}]'
@@ -109,45 +184,99 @@ def make_node_wrapper(
   return NodeWrapper
 
 
+# renders a graphviz graph to SVG, caching the SVGs of the last few sources
+@lru_cache(maxsize=32)
+def _render_source_svg(source, engine):
+  return Source(source, engine=engine).pipe(format='svg', encoding='utf-8')
+
+
+def _render_svg(G):
+  return _render_source_svg(G.source, G.engine)
+
+
 class GVWrapper:
+  __slots__ = ('G', '_a_lists', '_last_obj', '_last_wn', '_svg', '_wn2gid', 'node_wrapper', 'nodes')
+
   def __init__(self, gv_graph_args=None, node_wrapper=None):
     gv_graph_args = gv_graph_args or {}
-    gv_graph_args['node_attr'] = {'fontname': GV_FONT_NAME, 'fontsize': GV_FONT_SIZE} | (
-      gv_graph_args['node_attr'] if 'node_attr' in gv_graph_args else {}
-    )
-    gv_graph_args['edge_attr'] = {'fontname': GV_FONT_NAME, 'fontsize': GV_FONT_SIZE} | (
-      gv_graph_args['edge_attr'] if 'edge_attr' in gv_graph_args else {}
-    )
+    # the font attributes come first, and are merged with the given ones only if present
+    for attr in 'node_attr', 'edge_attr':
+      given = gv_graph_args.get(attr)
+      gv_graph_args[attr] = _GV_FONT_ATTRS | given if given else dict(_GV_FONT_ATTRS)
     node_wrapper = node_wrapper or make_node_wrapper()
     self.G = Digraph(**gv_graph_args)
     self.node_wrapper = node_wrapper
     self.nodes = set()
+    self._wn2gid = {}  # the registry of the node wrappers of this graph
+    # the last wrapped object and its wrapper
+    self._last_obj, self._last_wn = object(), None
+    # the rendered SVG, reset by every method that can change the graph
+    self._svg = None
+    self._a_lists = {}
 
   def wrapped_graph(self):
+    self._svg = None
     return self.G
 
   def subgraph(self, **args):
+    self._svg = None
     return self.G.subgraph(**args)
 
+  # the statements are appended to the body directly (G can also be a list, see same_rank)
   def node(self, obj, G=None, gv_args=None):
-    if G is None:
-      G = self.G
-    wn = self.node_wrapper(obj)
+    if obj is self._last_obj:  # the node has already been added, nothing to do
+      return self._last_wn
+    body = self.G.body if G is None else G if isinstance(G, list) else G.body
+    wn = self.node_wrapper(obj, self._wn2gid)
     if wn.gid() not in self.nodes:
-      G.node(wn.gid(), wn.label(), **(wn.gv_args() | (gv_args or {})))
+      body.append(f'\t{wn.gid()}{self._attr_list(wn.label(), wn.gv_args() | gv_args if gv_args else wn.gv_args())}\n')
       self.nodes.add(wn.gid())
+      self._svg = None
+    self._last_obj, self._last_wn = obj, wn
     return wn
 
+  # objsrc and objdst can also be node wrappers, as returned by node, that are used as they are
   def edge(self, objsrc, objdst, G=None, gv_args=None):
-    if G is None:
-      G = self.G
-    G.edge(self.node(objsrc).gid(), self.node(objdst).gid(), **(gv_args or {}))
+    body = self.G.body if G is None else G if isinstance(G, list) else G.body
+    src = objsrc if isinstance(objsrc, self.node_wrapper) else self.node(objsrc)
+    dst = objdst if isinstance(objdst, self.node_wrapper) else self.node(objdst)
+    body.append(f'\t{src.gid()} -> {dst.gid()}{self._attr_list(gv_args=gv_args)}\n')
+    self._svg = None
+
+  # as graphviz.quoting.attr_list, caching the part of the attributes not depending on the label
+  def _a_list(self, gv_args):
+    try:
+      key = tuple(gv_args.items())
+      a_list = self._a_lists.get(key)
+    except TypeError:  # unhashable attribute values
+      return self.G._a_list(kwargs=gv_args)
+    if a_list is None:
+      a_list = self._a_lists[key] = self.G._a_list(kwargs=gv_args)
+    return a_list
+
+  def _attr_list(self, label=None, gv_args=None):
+    a_list = self._a_list(gv_args) if gv_args else ''
+    if label is not None:
+      a_list = f'label={self.G._quote(label)} {a_list}' if a_list else f'label={self.G._quote(label)}'
+    return f' [{a_list}]' if a_list else ''
+
+  # emits the statements as an anonymous rank=same subgraph (with invisible edges, if required)
+  def same_rank(self, statements, invis_edges=False):
+    body = self.G.body
+    body.append(
+      '\t{\n\t\tgraph [rank=same]\n\t\tedge [style=invis]\n' if invis_edges else '\t{\n\t\tgraph [rank=same]\n'
+    )
+    body.extend(['\t' + s for s in statements])
+    body.append('\t}\n')
+    self._svg = None
 
   def __repr__(self):
     return 'GVWrapper[\n' + indent(str(self.G), '\t') + ']'
 
   def _repr_svg_(self):
-    return self.G._repr_image_svg_xml()
+    if self._svg is None:
+      self._svg = _render_svg(self.G)
+    return self._svg
 
 
 class BaseGraph(ABC):
@@ -159,15 +288,35 @@ class BaseGraph(ABC):
     pass
 
   # letstr(node) is always used as node_label
-  # node_id is str(x) where x is id (if not None) or hash(node_label)
+  # node_id is str(id) if id is not None, otherwise Nx where x counts the distinct node_labels
   def node(self, G, node, id=None, sep=None, gv_args=None):  # noqa: A002
     wwarn('The method "node" is deprecated, use GVWrapper instead of BaseGraph', DeprecationWarning, stacklevel=2)
     if gv_args is None:
       gv_args = {}
     if not hasattr(self, '_nodes'):
       self._nodes = set()
-    node_label = letstr(node, sep)
-    node_id = str(hash(node_label) if id is None else id)
+      self._node_ids = {}
+      self._label_ids = {}
+    key = (id,) if id is not None else (node, sep) if type(node) is str else None
+    if key is not None:
+      try:
+        node_id = self._node_ids.get(key)
+      except TypeError:  # unhashable id
+        key = node_id = None
+      if node_id is not None:
+        return node_id
+    node_label = _letstr(node, sep)
+    if id is not None:
+      node_id = str(id)
+    else:
+      node_id = self._label_ids.get(node_label)
+      if node_id is None:
+        k = len(self._label_ids) + 1
+        while f'N{k}' in self._nodes:  # skip the ids already given explicitly
+          k += 1
+        node_id = self._label_ids[node_label] = f'N{k}'
+    if key is not None:
+      self._node_ids[key] = node_id
     if node_id in self._nodes:
       return node_id
     G.node(node_id, node_label, **gv_args)
@@ -189,7 +338,10 @@ class BaseGraph(ABC):
       DeprecationWarning,
       stacklevel=2,
     )
-    return self._gvgraph_()._repr_image_svg_xml()
+    # the SVG is rendered once, since node ids are remembered across calls
+    if getattr(self, '_svg_cache', None) is None:
+      self._svg_cache = _render_svg(self._gvgraph_())
+    return self._svg_cache
 
 
 class Tree:
@@ -212,21 +364,28 @@ class Tree:
   It also has a representation as a graph; in such case, if the tree is annotated it
   will be rendered by Graphviz using `HTML-Like Labels <https://www.graphviz.org/doc/info/shapes.html#html>`__
   built as a table where each dictionary item corresponds to a row with two columns containing the
-  key and value pair of such item.
+  key and value pair of such item. To keep the rendering of large trees fast, the
+  Graphviz layout runs a bounded number of iterations, unless the :attr:`fast_layout`
+  class attribute is set to ``False``.
 
   Args:
     root: the root node content (can be of any type).
     children: an :term:`iterable` of trees to become the current tree children.
   """
 
+  __slots__ = ('attr', 'children', 'root')
+
+  fast_layout = True
+
   def __init__(self, root, children=None):
     self.root = root
     self.children = list(children) if children else []
-    if isinstance(root, Mapping):
+    if type(root) is dict or (type(root) is not str and isinstance(root, Mapping)):
       self.attr = AttrDict(root)
 
   def __iter__(self):
-    return iter([self.root, *self.children])
+    yield self.root
+    yield from self.children
 
   @classmethod
   def from_lol(cls, lol):
@@ -251,44 +410,61 @@ class Tree:
 
     """
 
-    def _to_tree(lst):
-      root, *children = lst
-      return cls(root, [_to_tree(child) for child in children])
-
-    return _to_tree(lol)
+    res = []
+    stack = [(res, lol)]
+    while stack:
+      children, lst = stack.pop()
+      it = iter(lst)
+      try:
+        T = cls(next(it))
+      except StopIteration:
+        raise ValueError('not enough values to unpack (expected at least 1, got 0)') from None
+      children.append(T)
+      stack.extend([(T.children, child) for child in it][::-1])
+    return res[0]
 
   def __repr__(self):
-    def walk(T):
-      return '({}: {})'.format(T.root, ', '.join(map(walk, T.children))) if T.children else f'({T.root})'
-
-    return walk(self)
+    # a postorder visit, where a tree is pushed again (marked as done) before its children
+    out = []
+    stack = [(self, False)]
+    while stack:
+      T, done = stack.pop()
+      if not T.children:
+        out.append(f'({T.root})')
+      elif done:
+        children = out[-len(T.children) :]
+        del out[-len(T.children) :]
+        out.append('({}: {})'.format(T.root, ', '.join(children)))
+      else:
+        stack.append((T, True))
+        stack.extend((child, False) for child in reversed(T.children))
+    return out[0]
 
   def _gv_graph_(self):
     G = GVWrapper(
       dict(  # noqa: C408
-        graph_attr={'nodesep': '.25', 'ranksep': '.25'},
+        graph_attr={'nodesep': '.25', 'ranksep': '.25'} | (_FAST_LAYOUT if self.fast_layout else {}),
         node_attr={'shape': 'box', 'width': '0', 'height': '0', 'style': 'rounded, setlinewidth(.25)'},
         edge_attr={'dir': 'none'},
       ),
       make_node_wrapper(
-        node_label=compose(make_mapping_aware_label(), itemgetter(0)),
-        node_gv_args=compose(mapping_aware_gv_args, itemgetter(0)),
+        node_label=_first_mapping_aware_label,
+        node_gv_args=_first_mapping_aware_gv_args,
       ),
     )
 
-    def walk(T):
-      curr = (T.root, T)
-      G.node(curr)
-      for child in T.children:
-        G.edge(curr, (child.root, child))
-      if len(T.children) > 1:
-        with G.subgraph(edge_attr={'style': 'invis'}, graph_attr={'rank': 'same'}) as S:
-          for f, t in pairwise(T.children):
-            G.edge((f.root, f), (t.root, t), S)
+    # a preorder visit, where every node is wrapped when its parent is visited
+    stack = [(self, G.node((self.root, self)))]
+    while stack:
+      T, curr = stack.pop()
+      children = []
       for child in T.children:
-        walk(child)
-
-    walk(self)
+        wn = G.node((child.root, child))
+        G.edge(curr, wn)
+        children.append((child, wn))
+      if len(children) > 1:
+        G.same_rank([f'\t{f.gid()} -> {t.gid()}\n' for (_, f), (_, t) in pairwise(children)], invis_edges=True)
+      stack.extend(reversed(children))
     return G
 
   def _repr_svg_(self):
@@ -315,47 +491,62 @@ class Tree:
     G.wrapped_graph().edge_attr['arrowsize'] = '.5'
 
     node_args = {'shape': 'point', 'width': '.07', 'height': '.07', 'color': 'red'}
+    label_args = {'color': 'red', 'fontcolor': 'red', 'fontsize': '10', 'width': '.04', 'height': '.04'}
     edge_args = {'dir': 'forward', 'arrowhead': 'vee', 'arrowsize': '.5', 'style': 'dashed', 'color': 'red'}
+    label_edge_args = edge_args | {'arrowhead': 'none'}
+
+    # the trees are wrapped once, by identity
+    wns = {}
 
-    for node in threads:
-      if 'type' in node.root and node.root['type'] in ('<BEGIN>', '<JOIN>', '<END>'):
-        G.node((node.root, node), gv_args=node_args)
+    def node(T, gv_args=None):
+      wn = wns.get(id(T))
+      if wn is None:
+        wn = wns[id(T)] = G.node((T.root, T), gv_args=gv_args)
+      return wn
 
-    for node, info in threads.items():
+    for T in threads:
+      if 'type' in T.root and T.root['type'] in ('<BEGIN>', '<JOIN>', '<END>'):
+        node(T, node_args)
+
+    for T, info in threads.items():
+      src = node(T)
       for nxt in info:
         if nxt == 'next':
-          G.edge(
-            (node.root, node),
-            (info[nxt].root, info[nxt]),
-            gv_args=edge_args
-          )
+          G.edge(src, node(info[nxt]), gv_args=edge_args)
         else:
-          G.node((nxt, (1, node)), gv_args={'color': 'red', 'fontcolor': 'red', 'fontsize': '10', 'width': '.04', 'height': '.04'})
-          G.edge(
-            (node.root, node),
-            (nxt, (1, node)),
-            gv_args=edge_args | {'arrowhead': 'none'}
-          )
-          G.edge(
-            (nxt, (1, node)),
-            (info[nxt].root, info[nxt]),
-            gv_args=edge_args
-          )
+          label = G.node((nxt, (1, T)), gv_args=label_args)
+          G.edge(src, label, gv_args=label_edge_args)
+          G.edge(label, node(info[nxt]), gv_args=edge_args)
 
     return G
 
 
 class Graph:
+  __slots__ = ('G', 'adj')
+
   def __init__(self, arcs, sep=None):
     self.G = GVWrapper(
       dict(graph_attr={'size': '8', 'rankdir': 'LR'}, node_attr={'shape': 'oval'}),  # noqa: C408
-      make_node_wrapper(node_label=make_mapping_aware_label(other_str=partial(letstr, sep=sep))),
+      make_node_wrapper(node_label=make_mapping_aware_label(other_str=partial(_letstr, sep=sep))),
     )
-    self.adj = {}
+    wns = {}
+
+    def node(X):
+      wn = wns.get(X)
+      if wn is None:
+        wn = wns[X] = self.G.node(X)
+      return wn
+
+    adj = defaultdict(set)
     for src, dst in arcs:
-      self.adj[src] = self.adj.get(src, set()) | {dst}
-      self.adj[dst] = self.adj.get(dst, set())
-      self.G.edge(src, dst)
+      succ = adj[src]
+      if dst in succ:  # repeated arcs are drawn once
+        continue
+      succ.add(dst)
+      if dst not in adj:
+        adj[dst] = set()
+      self.G.edge(node(src), node(dst))
+    self.adj = {X: frozenset(succ) for X, succ in adj.items()}
 
   def neighbors(self, src):
     """Returns (a set containing) the neighbors of the given node.
@@ -363,7 +554,7 @@ class Graph:
     Args:
       src: the node.
     """
-    return frozenset(self.adj[src])
+    return self.adj[src]
 
   @classmethod
   def from_adjdict(cls, adjdict):
@@ -382,6 +573,10 @@ class Graph:
 
 
 class ProductionGraph:
+  __slots__ = ('G', 'compact', 'derivation')
+
+  fast_layout = True
+
   def __init__(self, derivation, compact=None):
     self.derivation = derivation
     if compact is None:
@@ -399,7 +594,7 @@ class ProductionGraph:
     derivation = self.derivation
     G = GVWrapper(
       dict(  # noqa: C408
-        graph_attr={'nodesep': '.25', 'ranksep': '.25'},
+        graph_attr={'nodesep': '.25', 'ranksep': '.25'} | (_FAST_LAYOUT if self.fast_layout else {}),
         node_attr={
           'shape': 'box',
           'margin': '.05',
@@ -409,62 +604,63 @@ class ProductionGraph:
         },
         edge_attr={'dir': 'none', 'penwidth': '.5', 'arrowsize': '.5'},
       ),
-      make_node_wrapper(node_label=compose(make_mapping_aware_label(), itemgetter(0))),
+      make_node_wrapper(node_label=_first_mapping_aware_label),
     )
 
-    def remove_ε(sentence):
-      return tuple(_ for _ in sentence if _[0] != ε)
-
-    sentence = ((derivation.start, 0, 0),)
-    for step, (rule, pos) in enumerate(derivation.steps(), 1):
-      lhs, rhs = derivation.G.P[rule].as_type0()
-      rhsn = tuple((X, step, p) for p, X in enumerate(rhs))
-      sentence = remove_ε(sentence[:pos] + rhsn + sentence[pos + len(lhs) :])
-    last_sentence = set(sentence)
+    # the derivation is replayed once, numbering the symbol occurrences in order of appearance
+    steps = derivation.steps()
+    type0_prods = {rule: derivation.G.P[rule].as_type0() for rule in {rule for rule, _ in steps}}
+    occurrences = [(derivation.start, 0, 0)]
+    sentence = [0]
+    replaced = []
+    for step, (rule, pos) in enumerate(steps, 1):
+      lhs, rhs = type0_prods[rule]
+      first = len(occurrences)
+      occurrences.extend((X, step, p) for p, X in enumerate(rhs))
+      rhsn = range(first, len(occurrences))
+      replaced.append((step, sentence[pos : pos + len(lhs)], rhsn))
+      # ε can only be the whole rhs (see Production), so no symbol needs to be filtered out
+      sentence[pos : pos + len(lhs)] = () if rhs[0] == ε else rhsn
+    thin, thick = {'style': 'rounded, setlinewidth(.25)'}, {'style': 'rounded, setlinewidth(1.25)'}
+    styles = [thin] * len(occurrences)
+    for n in sentence:
+      styles[n] = thick
 
     use_levels = not self.compact
 
-    sentence = ((derivation.start, 0, 0),)
-    with G.subgraph(graph_attr={'rank': 'same'}) as S:
+    wns = [None] * len(occurrences)
+
+    # the rank=same subgraphs of every step are collected as lists of statements emitted by same_rank
+    S = []
+    if use_levels:
+      prev_level = G.node(('level', 0), S, gv_args={'style': 'invis'})
+    wns[0] = G.node(occurrences[0], S)
+    G.same_rank(S)
+
+    for step, lhsn, rhsn in replaced:
+      S = []
       if use_levels:
-        prev_level = ('level', 0)
-        G.node(prev_level, S, gv_args={'style': 'invis'})
-      G.node(sentence[0], S)
-
-    for step, (rule, pos) in enumerate(derivation.steps(), 1):
-      lhs, rhs = derivation.G.P[rule].as_type0()
-      rhsn = tuple((X, step, p) for p, X in enumerate(rhs))
-
-      with G.subgraph(graph_attr={'rank': 'same'}, edge_attr={'style': 'invis'}) as S:
-        if use_levels:
-          new_level = ('level', step)
-          G.node(new_level, S, gv_args={'style': 'invis'})
-          G.edge(prev_level, new_level, gv_args={'style': 'invis'})
-          prev_level = new_level
-
-        for node in rhsn:
-          G.node(
-            node,
-            S,
-            gv_args={'style': 'rounded, setlinewidth(1.25)' if node in last_sentence else 'rounded, setlinewidth(.25)'},
-          )
-
-        for f, t in pairwise(rhsn):
-          G.edge(f, t, S)
-
-      if len(lhs) == 1:
-        frm = sentence[pos]
+        new_level = G.node(('level', step), S, gv_args={'style': 'invis'})
+        G.edge(prev_level, new_level, gv_args={'style': 'invis'})
+        prev_level = new_level
+
+      for n in rhsn:
+        wns[n] = G.node(occurrences[n], S, gv_args=styles[n])
+
+      for f, t in pairwise(rhsn):
+        G.edge(wns[f], wns[t], S)
+      G.same_rank(S, invis_edges=True)
+
+      if len(lhsn) == 1:
+        frm = wns[lhsn[0]]
         for to in rhsn:
-          G.edge(frm, to)
+          G.edge(frm, wns[to])
       else:
-        dot = ('dot', step)
-        G.node(dot, gv_args={'shape': 'point', 'width': '.07', 'height': '.07'})
-        for frm in sentence[pos : pos + len(lhs)]:
-          G.edge(frm, dot)
+        dot = G.node(('dot', step), gv_args={'shape': 'point', 'width': '.07', 'height': '.07'})
+        for frm in lhsn:
+          G.edge(wns[frm], dot)
         for to in rhsn:
-          G.edge(dot, to)
-
-      sentence = remove_ε(sentence[:pos] + rhsn + sentence[pos + len(lhs) :])
+          G.edge(dot, wns[to])
 
     self.G = G
     return G
@@ -501,6 +697,10 @@ class StateTransitionGraph:
    edge entering into it, whereas the *final nodes* are doubly circled.
   """
 
+  __slots__ = ('F', 'G', 'S', 'large_labels', 'transitions')
+
+  fast_layout = True
+
   def __init__(self, transitions, S=None, F=None, large_labels=False):
     self.transitions = tuple(transitions)
     self.S = S
@@ -531,22 +731,36 @@ class StateTransitionGraph:
     if self.G:
       return self.G
     sep = '\n' if self.large_labels else None
+    # the node gv args are computed once per state
+    F, final, nonfinal = self.F, {'peripheries': '2'}, {'peripheries': '1'}
     G = GVWrapper(
       dict(  # noqa: C408
-        graph_attr={'rankdir': 'LR', 'size': '32'},
+        graph_attr={'rankdir': 'LR', 'size': '32'} | (_FAST_LAYOUT if self.fast_layout else {}),
         node_attr={'margin': '.05'} if self.large_labels else {},
         engine='dot',
       ),
       make_node_wrapper(
-        node_label=make_mapping_aware_label(other_str=partial(letstr, sep=sep)),
-        node_gv_args=lambda X: {'peripheries': '2' if X in self.F else '1'},
+        node_label=make_mapping_aware_label(other_str=partial(_letstr, sep=sep)),
+        node_gv_args=lambda X: final if X in F else nonfinal,
       ),
     )
+    wns = {}
+
+    def node(X):
+      try:
+        wn = wns.get(X)
+      except TypeError:  # unhashable state
+        return G.node(X)
+      if wn is None:
+        wn = wns[X] = G.node(X)
+      return wn
+
     if self.S is not None:
       G.node('', gv_args={'shape': 'point'})
-      G.edge('', self.S)
+      G.edge('', node(self.S))
+    edge, label = G.edge, 'xlabel' if self.large_labels else 'label'
     for X, x, Y in self.transitions:
-      G.edge(X, Y, gv_args={'xlabel' if self.large_labels else 'label': x})
+      edge(node(X), node(Y), gv_args={label: x})
     self.G = G
     return G
 
@@ -557,28 +771,43 @@ class StateTransitionGraph:
 # Python AST stuff
 
 
+# the fields of the AST nodes that are not represented in the tree
+_AST_SKIP = frozenset({'type_ignores', 'type_comment'})
+
+
 def pyast2tree(node):
-  return (
-    Tree(
-      {'type': 'ast', 'name': node.__class__.__name__},
-      [
-        Tree(name, [pyast2tree(v) for v in (value if isinstance(value, list) else [value])])
-        for name, value in ast.iter_fields(node)
-        if name not in {'type_ignores', 'type_comment'}
-      ],
-    )
-    if isinstance(node, ast.AST)
-    else Tree({'type': 'token', 'value': node})
-  )
+  res = []
+  stack = [(res, node)]
+  while stack:
+    children, obj = stack.pop()
+    if not isinstance(obj, ast.AST):
+      children.append(Tree({'type': 'token', 'value': obj}))
+      continue
+    fields = []
+    for name in obj._fields:
+      if name in _AST_SKIP:
+        continue
+      try:
+        value = getattr(obj, name)
+      except AttributeError:  # as in ast.iter_fields, missing fields are skipped
+        continue
+      field = Tree(name)
+      fields.append(field)
+      stack.extend((field.children, v) for v in reversed(value if isinstance(value, list) else [value]))
+    children.append(Tree({'type': 'ast', 'name': obj.__class__.__name__}, fields))
+  return res[0]
 
 
 # Jupyter Widgets sfuff
 
 
 def animate_derivation(d, height='300px'):
-  steps = d.steps()
-  d = Derivation(d.G)
-  ui = interactive(lambda n: display(ProductionGraph(d.step(steps[:n]))), n=IntSlider(min=0, max=len(steps), value=0))
+  derivations = [Derivation(d.G)]
+  for rule, pos in d.steps():
+    derivations.append(derivations[-1].step(rule, pos))
+  # the graphs are kept per step, since they cache their SVG
+  graph = lru_cache(maxsize=None)(lambda n: ProductionGraph(derivations[n]))
+  ui = interactive(lambda n: display(graph(n)), n=IntSlider(min=0, max=len(derivations) - 1, value=0))
   ui.children[-1].layout.height = height
   return ui
 
@@ -587,11 +816,12 @@ def animate_derivation(d, height='300px'):
 
 
 def __bordered_table__(content):  # noqa: N807
-  return HTML(
-    f'<style>td, th {{border: 1pt solid lightgray !important;}} table * {{font-family: "{HTML_FONT_NAME}";}}</style><table>'
-    + content
-    + '</table>'
-  )
+  return HTML(HTML_TABLE_STYLE + '<table>' + content + '</table>')
+
+
+# the root svg tag, and its size attributes, to resize the svg without parsing it as a whole
+_SVG_ROOT_RE = re.compile(r'<svg\b[^>]*>')
+_SVG_SIZE_RE = re.compile(r'(\s)(width|height)="[^"]*"')
 
 
 def resized_svg_repr(obj, width=800, height=600):
@@ -601,6 +831,13 @@ def resized_svg_repr(obj, width=800, height=600):
     svg_str = obj._repr_svg_()
   else:
     raise TypeError('The given object has no svg representation')
+  # only the attributes of the root tag are rewritten
+  match = _SVG_ROOT_RE.search(svg_str) if isinstance(svg_str, str) else None
+  if match is not None:
+    size = {'width': str(width), 'height': str(height)}
+    root, n = _SVG_SIZE_RE.subn(lambda m: f'{m[1]}{m[2]}="{size[m[2]]}"', match[0])
+    if n == 2:
+      return SVG(svg_str[: match.start()] + root + svg_str[match.end() :])
   svg_figure = svg_ttransform.fromstring(svg_str)
   svg_figure.set_size((str(width), str(height)))
   return SVG(svg_figure.to_str())
@@ -609,49 +846,59 @@ def resized_svg_repr(obj, width=800, height=600):
 def side_by_side(*iterable):
   if len(iterable) == 1:
     iterable = iterable[0]
-  return HTML('<div>{}</div>'.format(' '.join(item._repr_svg_() for item in iterable)))
+  items = list(iterable)
+  # the graphs are built in this thread (their caches are filled without locks), only dot runs concurrently
+  wrappers, others = {}, {}
+  for item in items:
+    if id(item) in wrappers or id(item) in others:
+      continue
+    gw = item._gv_graph_() if hasattr(item, '_gv_graph_') else item
+    if isinstance(gw, GVWrapper) and gw._svg is None:
+      wrappers[id(item)] = gw
+    else:
+      others[id(item)] = gw
+  with ThreadPoolExecutor(max_workers=max(1, min(8, len(wrappers)))) as ex:
+    futures = {k: ex.submit(_render_source_svg, gw.G.source, gw.G.engine) for k, gw in wrappers.items()}
+    svgs = {k: obj._repr_svg_() for k, obj in others.items()}
+  for k, future in futures.items():
+    wrappers[k]._svg = svgs[k] = future.result()
+  return HTML('<div>{}</div>'.format(' '.join([svgs[id(item)] for item in items])))
+
+
+# the fixed HTML fragments of the tables
+_TH_LEFT = '<th style="text-align:left">'
+_TD_LEFT = '<td style="text-align:left">'
 
 
 def iter2table(it):
   return __bordered_table__(
-    '\n'.join(
-      f'<tr><th style="text-align:left">{n}<td style="text-align:left"><pre>{_escape(e)}</pre>'
-      for n, e in enumerate(it)
-    )
+    '\n'.join([f'<tr>{_TH_LEFT}{n}{_TD_LEFT}<pre>{_escape(e)}</pre>' for n, e in enumerate(it)])
   )
 
 
 def dict2table(it):
-  return __bordered_table__(
-    '\n'.join(
-      f'<tr><th style="text-align:left">{k}<td style="text-align:left"><pre>{_escape(v)}</pre>' for k, v in it.items()
-    )
-  )
+  return __bordered_table__('\n'.join([f'<tr>{_TH_LEFT}{k}{_TD_LEFT}<pre>{_escape(v)}</pre>' for k, v in it.items()]))
 
 
 def dod2table(dod, sort=False, sep=None):
-  def fmt(r, c):
-    if c not in dod[r]:
-      return '&nbsp;'
-    elem = dod[r][c]
-    if elem is None:
-      return '&nbsp;'
-    return f'<pre>{letstr(elem, sep)}</pre>'
-
   rows = list(dod.keys())
   if sort:
     rows = sorted(rows)
-  cols = list(OrderedDict.fromkeys(chain.from_iterable(dod[x].keys() for x in dod)))
+  cols = Table._cols_of(dod.values())
   if sort:
     cols = sorted(cols)
-  head = '<tr><td>&nbsp;<th style="text-align:left">' + '<th style="text-align:left">'.join(cols)
-  body = '\n'.join(
-    '<tr><th style="text-align:left"><pre>{}</pre><td style="text-align:left">{}'.format(
-      letstr(r, sep), '<td style="text-align:left">'.join(fmt(r, c) for c in cols)
+  row_header = {r: f'<tr>{_TH_LEFT}<pre>{_letstr(r, sep)}</pre>{_TD_LEFT}' for r in rows}
+  # None stands both for missing and None elements
+  out = ['<tr><td>&nbsp;' + _TH_LEFT, _TH_LEFT.join(cols), '\n']
+  for r in rows:
+    out.append(row_header[r])
+    out.append(
+      _TD_LEFT.join(
+        ['&nbsp;' if elem is None else f'<pre>{_letstr(elem, sep)}</pre>' for elem in map(dod[r].get, cols)]
+      )
     )
-    for r in rows
-  )
-  return __bordered_table__(f'{head}\n{body}\n')
+    out.append('\n')
+  return __bordered_table__(''.join(out))
 
 
 def cyk2table(TABLE):
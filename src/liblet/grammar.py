@@ -1,6 +1,7 @@
 from functools import total_ordering
 from itertools import chain, groupby
 from operator import attrgetter
+from sys import intern
 from warnings import warn as wwarn
 
 from liblet.const import ε
@@ -13,6 +14,11 @@ def _letlrhstostr(s):
   return HAIR_SPACE.join(map(str, s)) if isinstance(s, tuple) else str(s)
 
 
+def _intern(symbol):
+  # symbols are interned so that equality checks with the special ones (as ε) are mostly identity checks
+  return intern(symbol) if type(symbol) is str else symbol
+
+
 @total_ordering
 class Production:
   """A grammar production.
@@ -44,13 +50,13 @@ class Production:
 
   def __init__(self, lhs, rhs):
     if isinstance(lhs, str) and lhs:
-      self.lhs = lhs
+      self.lhs = _intern(lhs)
     elif isinstance(lhs, list | tuple) and all(isinstance(_, str) and _ for _ in lhs):
-      self.lhs = tuple(lhs)
+      self.lhs = tuple(map(_intern, lhs))
     else:
       raise ValueError('The left-hand side is not a nonempty str, nor a tuple (or list) of nonempty str.')
     if isinstance(rhs, list | tuple) and rhs and all(isinstance(_, str) and _ for _ in rhs):
-      self.rhs = tuple(rhs)
+      self.rhs = tuple(map(_intern, rhs))
     else:
       raise ValueError('The right-hand side is not a tuple (or list) of nonempty str.')
     if ε in self.rhs and len(self.rhs) != 1:
@@ -1,12 +1,11 @@
-from collections import OrderedDict, defaultdict, deque
+from collections import defaultdict, deque
 from collections.abc import MutableMapping, Set  #  noqa: PYI025
 from functools import partial, reduce
 from html import escape
-from itertools import chain
 from sys import stderr
 from warnings import warn as wwarn
 
-from liblet.const import HTML_FONT_NAME
+from liblet.const import HTML_LEFT_TABLE_STYLE
 
 
 def suffixes(α):
@@ -131,6 +130,94 @@ class Stack:
     return len(self.S)
 
 
+class PStack:
+  """A *persistent* (immutable) *stack* providing the usual ``push``, ``pop``, and ``peek`` methods.
+
+  The stack is a linked list of ``(top, rest)`` cells: ``push`` and ``pop`` never modify the
+  stack, but return a new one sharing all the remaining cells with the original, so that both
+  take constant time and copying a stack costs nothing. As for :class:`Stack`, iteration goes
+  from the bottom to the top of the stack.
+  """
+
+  __slots__ = ('_cell', '_hash', '_len')
+
+  def __init__(self, iterable=None):
+    cell, n = None, 0
+    if iterable is not None:
+      for item in iterable:
+        cell, n = (item, cell), n + 1
+    self._cell = cell
+    self._len = n
+    self._hash = None
+
+  @classmethod
+  def _from_cell(cls, cell, n):
+    s = object.__new__(cls)
+    s._cell = cell
+    s._len = n
+    s._hash = None
+    return s
+
+  def push(self, item):
+    """Returns a new stack obtained pushing the given item on top of this one."""
+    return PStack._from_cell((item, self._cell), self._len + 1)
+
+  def peek(self):
+    if self._cell is None:
+      raise IndexError('peek from an empty stack')
+    return self._cell[0]
+
+  def pop(self):
+    """Returns the pair ``(top, rest)`` of the top item and the stack obtained removing it."""
+    if self._cell is None:
+      raise IndexError('pop from an empty stack')
+    top, rest = self._cell
+    return top, PStack._from_cell(rest, self._len - 1)
+
+  def __copy__(self):
+    return self
+
+  # the stack is pickled as its items, since the cached hash depends on the hash seed of the process
+  def __reduce__(self):
+    return (type(self), (tuple(self),))
+
+  # the cells are walked in a loop (comparing, or hashing, the nested cells would recurse once per
+  # item), and the comparison stops as soon as the two stacks share the rest of their cells
+  def __eq__(self, other):
+    if not isinstance(other, PStack):
+      return False
+    if self._len != other._len:
+      return False
+    a, b = self._cell, other._cell
+    while a is not b:
+      x, y = a[0], b[0]
+      if not (x is y or x == y):
+        return False
+      a, b = a[1], b[1]
+    return True
+
+  def __hash__(self):
+    if self._hash is None:
+      self._hash = hash(tuple(reversed(self)))
+    return self._hash
+
+  def __reversed__(self):
+    cell = self._cell
+    while cell is not None:
+      top, cell = cell
+      yield top
+
+  def __iter__(self):
+    return reversed(tuple(reversed(self)))
+
+  def __repr__(self):
+    el = ', '.join(map(repr, self))
+    return 'PStack({})'.format(f'{el} ↔' if el else '')
+
+  def __len__(self):
+    return self._len
+
+
 class AttrDict(MutableMapping):
   """A :class:`~collections.abc.MutableMapping` implementation that wraps
   a given mapping ``d`` so that if ``ad = AttrDict(d)`` it will then
@@ -233,6 +320,14 @@ class Table:
   def __hash__(self):
     return hash(self.data)
 
+  @staticmethod
+  def _cols_of(rows):
+    # the union of the keys of the rows, in order of first appearance
+    cols = {}
+    for row in rows:
+      cols.update(row)
+    return list(cols)
+
   def restrict_to(self, rows=None, cols=None):
     if rows is None:
       rows = list(self.data.keys())
@@ -245,65 +340,54 @@ class Table:
           R.data[r] = self.data[r]
     else:
       if cols is None and self.ndim == 2:  # noqa: PLR2004
-        cols = list(OrderedDict.fromkeys(chain.from_iterable(self.data[x].keys() for x in rows)))
+        cols = Table._cols_of(self.data[x] for x in rows)
       for r in rows:
         if r not in self.data:
           continue
+        row = self.data[r]
         for c in cols:
-          if c in self.data[r]:
-            R.data[r][c] = self.data[r][c]
+          if c in row:
+            R.data[r][c] = row[c]
     return R
 
   def _repr_html_(self):
     def _table(content):
-      return (
-        f'<style>td, th {{border: 1pt solid lightgray !important; text-align: left !important;}} table * {{font-family: "{HTML_FONT_NAME}";}}</style><table>'
-        + content
-        + '</table>'
-      )
+      return HTML_LEFT_TABLE_STYLE + '<table>' + content + '</table>'
 
-    def _fmt(r, c):
-      if c not in self.data[r]:
-        return '&nbsp;'
-      elem = self.data[r][c]
+    data, fmt = self.data, self.fmt
+    letstr_sort = fmt['letstr_sort']
+
+    def _fmt(row, c):
+      elem = row.get(c)  # a single lookup both for missing and None elements
       if elem is None:
         return '&nbsp;'
-      return '<pre>{}</pre>'.format(
-        escape(letstr(elem, self.fmt['elem_sep'], sort=self.fmt['letstr_sort'], remove_outer=True)),
-      )
+      return f'<pre>{escape(letstr(elem, fmt["elem_sep"], sort=letstr_sort, remove_outer=True))}</pre>'
 
+    rows = list(data.keys())
+    if fmt['rows_sort']:
+      rows = sorted(rows)
     if self.ndim == 2:  # noqa: PLR2004
-      rows = list(self.data.keys())
-      if self.fmt['rows_sort']:
-        rows = sorted(rows)
-      cols = list(OrderedDict.fromkeys(chain.from_iterable(self.data[x].keys() for x in rows)))
-      if self.fmt['cols_sort']:
+      cols = Table._cols_of(data[x] for x in rows)
+      if fmt['cols_sort']:
         cols = sorted(cols)
-      head = (
-        '<tr><td>&nbsp;<th><pre>'
-        + '</pre><th><pre>'.join(
-          letstr(col, self.fmt['cols_sep'], sort=self.fmt['letstr_sort'], remove_outer=True) for col in cols
-        )
-        + '</pre>'
-      )
-      body = '\n'.join(
-        '<tr><th><pre>{}<pre><td>'.format(
-          letstr(r, self.fmt['rows_sep'], sort=self.fmt['letstr_sort'], remove_outer=True)
-        )
-        + '<td>'.join(_fmt(r, c) for c in cols)
-        for r in rows
-      )
-      return _table(f'{head}\n{body}\n')
-    rows = list(self.data.keys())
-    if self.fmt['rows_sort']:
-      rows = sorted(rows)
+      out = [
+        '<tr><td>&nbsp;<th><pre>',
+        '</pre><th><pre>'.join([letstr(col, fmt['cols_sep'], sort=letstr_sort, remove_outer=True) for col in cols]),
+        '</pre>\n',
+      ]
+      for r in rows:
+        row = data[r]
+        out.append(f'<tr><th><pre>{letstr(r, fmt["rows_sep"], sort=letstr_sort, remove_outer=True)}<pre><td>')
+        out.append('<td>'.join([_fmt(row, c) for c in cols]))
+        out.append('\n')
+      return _table(''.join(out))
     return _table(
       '\n'.join(
-        '<tr><th><pre>{}</pre><td><pre>{}</pre>'.format(
-          letstr(r, self.fmt['rows_sep'], sort=self.fmt['letstr_sort'], remove_outer=True),
-          letstr(self.data[r], self.fmt['elem_sep'], sort=self.fmt['letstr_sort'], remove_outer=True),
-        )
-        for r in rows
+        [
+          f'<tr><th><pre>{letstr(r, fmt["rows_sep"], sort=letstr_sort, remove_outer=True)}</pre>'
+          f'<td><pre>{letstr(data[r], fmt["elem_sep"], sort=letstr_sort, remove_outer=True)}</pre>'
+          for r in rows
+        ]
       )
     )
 
@@ -318,21 +402,21 @@ class CYKTable(Table):
     # when the nullable row (-, 0) is present the maximum key is (N + 1, 0)
     # (otherwise i <= N); in any case the lengths range in [N, L - 1)
     N = I - 1 if L == 0 else I
-    return (
-      '<style>td, th {border: 1pt solid lightgray !important ;}</style><table>'
-      + (
-        '<tr>'
-        + '<tr>'.join(
-          '<td style="text-align:left"><pre>'
-          + '</pre></td><td style="text-align:left"><pre>'.join(
-            (letstr(TABLE[(i, l)], sep='\n') if TABLE[(i, l)] else '&nbsp;') for i in range(1, N - l + 2)
-          )
-          + '</pre></td>'
-          for l in range(N, L - 1, -1)  # noqa: E741
+
+    # missing cells are shown as empty
+    get = TABLE.get
+    out = ['<style>td, th {border: 1pt solid lightgray !important ;}</style><table>']
+    for l in range(N, L - 1, -1):  # noqa: E741
+      cells = [get((i, l)) for i in range(1, N - l + 2)]
+      out.append('<tr><td style="text-align:left"><pre>')
+      out.append(
+        '</pre></td><td style="text-align:left"><pre>'.join(
+          [letstr(elem, sep='\n') if elem else '&nbsp;' for elem in cells]
         )
       )
-      + '</table>'
-    )
+      out.append('</pre></td>')
+    out.append('</table>')
+    return ''.join(out)
 
 
 def uc(s, c=''):  # pragma: nocover
@@ -1,3 +1,7 @@
+import os
+import pickle
+import subprocess
+import sys
 import unittest
 from copy import copy
 
@@ -22,6 +26,25 @@ class TestAutomaton(unittest.TestCase):
   def test_transition_totalorder(self):
     self.assertTrue(Transition('a', 'b', 'c') > Transition('a', 'b', 'b'))
 
+  def test_transition_le_ge(self):
+    a, b = Transition('a', 'b', 'b'), Transition('a', 'b', 'c')
+    self.assertEqual((True, True, False, True), (a <= b, a <= Transition('a', 'b', 'b'), a >= b, b >= a))
+
+  def test_transition_from_string_fresh(self):
+    a, b = Transition.from_string('A, a, B'), Transition.from_string('A, a, B')
+    a[0].to = 'C'
+    self.assertEqual('A-a->B', repr(b[0]))
+
+  def test_transition_pickle(self):
+    t = Transition('A', 'a', 'B')
+    hash(t)
+    # the transition is loaded in a process with another hash seed
+    code = "import pickle, sys; from liblet import Transition; t = pickle.loads(sys.stdin.buffer.read()); print(t == Transition('A', 'a', 'B'), Transition('A', 'a', 'B') in {t})"
+    seed = '2' if os.environ.get('PYTHONHASHSEED') == '1' else '1'
+    env = os.environ | {'PYTHONHASHSEED': seed, 'PYTHONPATH': os.pathsep.join(sys.path)}
+    out = subprocess.run([sys.executable, '-c', code], input=pickle.dumps(t), capture_output=True, env=env, check=True)
+    self.assertEqual('True True', out.stdout.decode().strip())
+
   def test_transition_eqo(self):
     self.assertFalse(Transition('a', 'b', 'c') == object())
 
@@ -38,6 +61,10 @@ class TestAutomaton(unittest.TestCase):
   def test_transition_set(self):
     self.assertEqual('{frm}-label->{to}', str(Transition({'frm'}, 'label', {'to'})))
 
+  def test_transition_set_hash(self):
+    S = {Transition({'frm'}, 'label', {'to'}), Transition(frozenset({'frm'}), 'label', frozenset({'to'}))}
+    self.assertEqual(1, len(S))
+
   def test_transition_setofitems(self):
     self.assertEqual('{A -> •B}-label->{C -> •D}', str(Transition({Item('A', ('B',))}, 'label', {Item('C', ('D',))})))
 
@@ -116,6 +143,51 @@ class TestAutomaton(unittest.TestCase):
     ).δ('S', 'a')
     self.assertEqual({'A', 'B'}, states)
 
+  def test_automaton_δ_none(self):
+    A = Automaton.from_string('S, a, A')
+    self.assertEqual(frozenset(), A.δ('A', 'a'))
+
+  def test_automaton_epsilon_closure(self):
+    # fig 5.14 pag 147
+    A = Automaton.from_grammar(
+      Grammar.from_string(
+        """
+      S -> A
+      S -> a B
+      A -> a A
+      A -> ε
+      B -> b B
+      B -> b
+    """
+      )
+    )
+    self.assertEqual(({'S', 'A', '◇'}, {'B'}), (A.epsilon_closure('S'), A.epsilon_closure('B')))
+
+  def test_automaton_epsilon_closure_cycle(self):
+    A = Automaton.from_string(
+      """
+      A, ε, B
+      B, ε, C
+      C, ε, A
+      C, x, D
+      D, ε, C
+    """
+    )
+    self.assertEqual(
+      [{'A', 'B', 'C'}, {'A', 'B', 'C'}, {'A', 'B', 'C'}, {'A', 'B', 'C', 'D'}],
+      [A.epsilon_closure(X) for X in 'ABCD'],
+    )
+
+  def test_automaton_epsilon_closure_bits(self):
+    A = Automaton.from_string(
+      """
+      A, ε, B
+      B, x, C
+      C, ε, A
+    """
+    )
+    self.assertEqual({'A', 'B', 'C'}, set(A.bits_to_states(A.epsilon_closure_bits('C'))))
+
   def test_automaton_from_grammar_fail3(self):
     with self.assertRaisesRegex(ValueError, 'has more than two symbols'):
       Automaton.from_grammar(Grammar.from_string('S -> a b c'))
@@ -169,6 +241,23 @@ class TestAutomaton(unittest.TestCase):
     s = 'Automaton(N={A, B, C, D, E, F, G, H}, T={0, 1}, transitions=(A-0->B, A-1->F, B-0->G, B-1->C, C-1->C, D-0->C, D-1->G, E-0->H, E-1->F, F-0->C, F-1->G, G-0->G, H-0->G, H-1->C), F={C}, q0=A)'
     self.assertEqual(s, str(A))
 
+  def test_automaton_bad_transitions_generator(self):
+    with self.assertRaisesRegex(ValueError, 'neither states nor input symbols'):
+      Automaton({'A', 'B'}, {'b'}, (t for t in (Transition('A', 'c', 'B'),)), 'A', set())
+
+  def test_automaton_from_string_ε(self):
+    A = Automaton.from_string('S, ε, A')
+    self.assertEqual(({'S', 'A'}, set()), (A.N, A.T))
+
+  def test_automaton_δ_set_state(self):
+    AB, C = frozenset({'A', 'B'}), frozenset({'C'})
+    A = Automaton({AB, C}, {'a'}, (Transition(AB, 'a', C),), AB, set())
+    self.assertEqual({C}, A.δ({'A', 'B'}, 'a'))
+
+  def test_automaton_ε_in_T(self):
+    A = Automaton({'A', 'B'}, {'ε'}, (Transition('A', 'ε', 'B'),), 'A', set())
+    self.assertEqual({'A', 'B'}, A.epsilon_closure('A'))
+
   def test_automaton_overlapTN(self):
     with self.assertRaisesRegex(ValueError, 'but have {B} in common'):
       Automaton({'A', 'B'}, {'B', 'C'}, (), set(), 'A')
@@ -187,16 +276,16 @@ class TestAutomaton(unittest.TestCase):
   def test_TDID_copy(self):
     i = TopDownInstantaneousDescription(Grammar.from_string('S -> s'))
     c = copy(i)
-    i.stack.push(1)
-    c.stack.push(2)
-    self.assertEqual(i.stack.pop(), 1)
+    i.stack = i.stack.push(1)
+    c.stack = c.stack.push(2)
+    self.assertEqual(i.stack.pop()[0], 1)
 
   def test_BUID_copy(self):
     i = BottomUpInstantaneousDescription(Grammar.from_string('S -> s'))
     c = copy(i)
-    i.stack.push(1)
-    c.stack.push(2)
-    self.assertEqual(i.stack.pop(), 1)
+    i.stack = i.stack.push(1)
+    c.stack = c.stack.push(2)
+    self.assertEqual(i.stack.pop()[0], 1)
 
   def test_TDID_init(self):
     G = Grammar.from_string(
@@ -261,6 +350,43 @@ class TestAutomaton(unittest.TestCase):
     with self.assertRaisesRegex(ValueError, r'.*top of the stack.*production'):
       i = i.predict(G.P[1])
 
+  def test_TDID_predict_ε(self):
+    G = Grammar.from_string(
+      """
+      S -> a B
+      B -> ε
+    """
+    )
+    i = TopDownInstantaneousDescription(G, 'a')
+    i = i.predict(G.P[0]).match().predict(G.P[1])
+    self.assertTrue(i.is_done())
+
+  def test_TDID_predict_ε_unpickled(self):
+    G = Grammar.from_string(
+      """
+      S -> a B
+      B -> ε
+    """
+    )
+    G = pickle.loads(pickle.dumps(G))
+    i = TopDownInstantaneousDescription(G, 'a')
+    i = i.predict(G.P[0]).match().predict(G.P[1])
+    self.assertEqual(['♯'], list(i.stack))
+    self.assertTrue(i.is_done())
+
+  def test_TDID_identity(self):
+    G = Grammar.from_string(
+      """
+      S -> A | B
+      A -> a
+      B -> a
+    """
+    )
+    i = TopDownInstantaneousDescription(G, 'a')
+    a = i.predict(G.P[0]).predict(G.P[2])
+    b = i.predict(G.P[1]).predict(G.P[3])
+    self.assertEqual(2, len({a, b}))
+
   def test_BUID_reduce(self):
     G = Grammar.from_string(
       """
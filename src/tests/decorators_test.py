@@ -24,6 +24,26 @@ class TestClosure(unittest.TestCase):
 
     self.assertEqual({0, 2, 4}, dec({4}, 2))
 
+  def test_closure_incremental(self):
+    @closure(incremental=True)
+    def dec(s, d):
+      return {x - d for x in s if x >= d}
+
+    self.assertEqual({0, 2, 4}, dec(frozenset({4}), 2))
+
+  def test_closure_notset(self):
+    dec = closure(lambda s: s if s[-1] == 0 else [*s, s[-1] - 1])
+    self.assertEqual([2, 1, 0], dec([2]))
+
+  def test_closure_dict_inplace(self):
+    @closure
+    def dec(d):
+      for k in d:
+        d[k] |= {x - 1 for x in d[k] if x > 0}
+      return d
+
+    self.assertEqual({'a': {0, 1, 2}}, dec({'a': {2}}))
+
   def test_show_calls_true(self):
     buf = StringIO()
 
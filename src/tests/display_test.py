@@ -0,0 +1,87 @@
+import threading
+import unittest
+import unittest.mock
+import warnings
+from collections.abc import Mapping
+
+from graphviz import Digraph
+
+from liblet import Tree, letstr
+from liblet.display import BaseGraph, _letstr, dod2table, side_by_side
+
+
+class TestDisplay(unittest.TestCase):
+  def test_letstr_equal_tuples(self):
+    actual = (_letstr((1, 2)), _letstr((True, 2)))
+    expected = (letstr((1, 2)), letstr((True, 2)))
+    self.assertEqual(expected, actual)
+
+  def test_letstr_equal_frozensets(self):
+    actual = (_letstr(frozenset({1})), _letstr(frozenset({True})))
+    expected = ('{1}', '{True}')
+    self.assertEqual(expected, actual)
+
+  def test_letstr_mutated_tree(self):
+    t = Tree('a')
+    before = _letstr((t,))
+    t.children.append(Tree('b'))
+    self.assertEqual(('((a))', '((a: (b)))'), (before, _letstr((t,))))
+
+  def test_tree_from_empty_lol(self):
+    with self.assertRaises(ValueError):
+      Tree.from_lol(['a', []])
+
+  def test_basegraph_node_ids(self):
+    class AGraph(BaseGraph):
+      def _gvgraph_(self):
+        return Digraph()
+
+    G = Digraph()
+    with warnings.catch_warnings():
+      warnings.simplefilter('ignore', DeprecationWarning)
+      g = AGraph()
+      ids = [g.node(G, 'x', id='N1'), g.node(G, 'y'), g.node(G, 'z')]
+    self.assertEqual(3, len(set(ids)))
+
+  def test_dod2table_fresh_elements(self):
+    class Cell:
+      def __init__(self, r, c):
+        self.rc = r + c
+
+      def __str__(self):
+        return self.rc
+
+    class Row(Mapping):
+      def __init__(self, r):
+        self.r = r
+
+      def __getitem__(self, c):
+        return Cell(self.r, c)  # a new object at every access
+
+      def __iter__(self):
+        return iter('ab')
+
+      def __len__(self):
+        return 2
+
+    html = dod2table({r: Row(r) for r in 'pqrstuvwxyz'}).data
+    self.assertTrue(all(f'<pre>{r}{c}</pre>' in html for r in 'pqrstuvwxyz' for c in 'ab'))
+
+  def test_side_by_side(self):
+    threads = []
+
+    def render(source, engine):
+      threads.append(threading.current_thread())
+      return source
+
+    a, b = Tree('a'), Tree('b')
+    with unittest.mock.patch('liblet.display._render_source_svg', side_effect=render):
+      html = side_by_side(a, b, a).data
+    sa, sb = a._gv_graph_().G.source, b._gv_graph_().G.source
+    self.assertEqual(f'<div>{sa} {sb} {sa}</div>', html)
+    self.assertEqual(2, len(threads))
+    self.assertNotIn(threading.main_thread(), threads)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 from liblet import Derivation, Grammar, Item, Production, Productions, ε
@@ -36,6 +37,10 @@ class TestGrammar(unittest.TestCase):
     with self.assertRaisesRegex(ValueError, 'contains ε but has more than one symbol'):
       Production('A', ('a', ε))
 
+  def test_production_interned_ε(self):
+    P = Productions.from_string('A -> ε')[0]
+    self.assertIs(ε, P.rhs[0])
+
   def test_production_unpack(self):
     lhs, rhs = Production('a', ['b'])
     self.assertEqual(('a', ('b',)), (lhs, rhs))
@@ -235,6 +240,16 @@ class TestGrammar(unittest.TestCase):
       d = d.step(prod, pos)
     self.assertEqual(('a', 'b'), d.sentential_form())
 
+  def test_derivation_sf_ε_unpickled(self):
+    G = Grammar.from_string(
+      """
+      S -> a B
+      B -> ε
+    """
+    )
+    d = Derivation(pickle.loads(pickle.dumps(G))).step(0, 0).step(1, 1)
+    self.assertEqual(('a',), d.sentential_form())
+
   def test_derivation_eqo(self):
     self.assertFalse(Derivation(Grammar.from_string('S -> s')) == object())
 
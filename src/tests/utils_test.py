@@ -1,8 +1,22 @@
+import os
+import pickle
+import subprocess
+import sys
 import unittest
 import unittest.mock
 from copy import copy
 
-from liblet import AttrDict, Queue, Stack, first, letstr, suffixes, union_of, warn
+from liblet import (
+  AttrDict,
+  PStack,
+  Queue,
+  Stack,
+  first,
+  letstr,
+  suffixes,
+  union_of,
+  warn,
+)
 
 
 class UtilsTest(unittest.TestCase):
@@ -93,6 +107,57 @@ class UtilsTest(unittest.TestCase):
     expected = '2 3 Stack(2 ↔)'
     self.assertEqual(expected, actual)
 
+  def test_pstack(self):
+    s = PStack().push(1).push(2).push(3)
+    n = len(s)
+    out, r = s.pop()
+    actual = f'{n} {out} {r} {s}'
+    expected = '3 3 PStack(1, 2 ↔) PStack(1, 2, 3 ↔)'
+    self.assertEqual(expected, actual)
+
+  def test_pstack_peek(self):
+    s = PStack([1, 2])
+    self.assertEqual(2, s.peek())
+
+  def test_pstack_shared(self):
+    s = PStack([1, 2, 3])
+    a = s.push(4)
+    b = s.push(5)
+    actual = f'{s} {a} {b}'
+    expected = 'PStack(1, 2, 3 ↔) PStack(1, 2, 3, 4 ↔) PStack(1, 2, 3, 5 ↔)'
+    self.assertEqual(expected, actual)
+
+  def test_pstack_copy(self):
+    s = PStack([1, 2, 3])
+    self.assertIs(s, copy(s))
+
+  def test_pstack_iter(self):
+    actual = (list(PStack([1, 2, 3])), list(reversed(PStack([1, 2, 3]))))
+    expected = ([1, 2, 3], [3, 2, 1])
+    self.assertEqual(expected, actual)
+
+  def test_pstack_eq_hash(self):
+    self.assertEqual({PStack([1, 2]), PStack().push(1).push(2)}, {PStack([1, 2])})
+
+  def test_pstack_deep(self):
+    a, b = PStack(range(200_000)), PStack(range(200_000))
+    c = b.pop()[1].push(-1)
+    self.assertEqual((True, False, True), (a == b, a == c, hash(a) == hash(b)))
+
+  def test_pstack_pickle(self):
+    s = PStack([1, 'a'])
+    hash(s)
+    # the stack is loaded in a process with another hash seed
+    code = "import pickle, sys; from liblet import PStack; s = pickle.loads(sys.stdin.buffer.read()); print(s == PStack([1, 'a']), PStack([1, 'a']) in {s})"
+    seed = '2' if os.environ.get('PYTHONHASHSEED') == '1' else '1'
+    env = os.environ | {'PYTHONHASHSEED': seed, 'PYTHONPATH': os.pathsep.join(sys.path)}
+    out = subprocess.run([sys.executable, '-c', code], input=pickle.dumps(s), capture_output=True, env=env, check=True)
+    self.assertEqual('True True', out.stdout.decode().strip())
+
+  def test_empty_pstack(self):
+    with self.assertRaises(IndexError):
+      PStack().pop()
+
   def test_queue(self):
     q = Queue()
     q.enqueue(1)